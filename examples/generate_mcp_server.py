@@ -1,28 +1,30 @@
 """Example usage of the MCP Generator agent."""
 
+import argparse
 import asyncio
 import os
-from dotenv import load_dotenv
+from typing import Optional
 
-from agent import graph
+import httpx
 
-# Load environment variables
-load_dotenv()
+from agent import graph, DEFAULT_INPUT_STATE
+from agent.graph import InputType, aclose_shared_client
+from agent.cache import ResultCache, cached_ainvoke
 
+# Environment variables from .env are loaded when the graph module is imported
 
-async def generate_from_openapi_example():
+
+async def generate_from_openapi_example(
+    http_client: Optional[httpx.AsyncClient] = None,
+    cache: Optional[ResultCache] = None,
+):
     """Example: Generate MCP server from OpenAPI specification."""
     # Input state with OpenAPI URL
     input_state = {
-        "openapi_url": "https://petstore.swagger.io/v2/swagger.json",
+        **DEFAULT_INPUT_STATE,
+        "input_type": InputType.OPENAPI,
+        "input_data": "https://petstore.swagger.io/v2/swagger.json",
         "max_iterations": 3,
-        "current_iteration": 0,
-        "deployment_stage": "none",
-        "errors": [],
-        "test_results": [],
-        "validation_errors": [],
-        "refinement_history": [],
-        "mcp_server_code": {},
     }
     
     # Configuration
@@ -33,13 +35,15 @@ async def generate_from_openapi_example():
             "freestyle_api_key": os.getenv("FREESTYLE_API_KEY"),
             "use_local_freestyle": True,  # Use local dev server
             "max_iterations": 3,
+            "http_client": http_client,
+            "anthropic_prompt_cache": True,
         }
     }
     
     print("Generating MCP server from OpenAPI spec...")
     
     # Run the agent
-    result = await graph.ainvoke(input_state, config)
+    result = await cached_ainvoke(graph, input_state, config, cache=cache)
     
     # Print results
     print(f"\nFinal status: {result.get('current_phase')}")
@@ -58,11 +62,16 @@ async def generate_from_openapi_example():
     return result
 
 
-async def generate_from_description_example():
+async def generate_from_description_example(
+    http_client: Optional[httpx.AsyncClient] = None,
+    cache: Optional[ResultCache] = None,
+):
     """Example: Generate MCP server from natural language description."""
     # Input state with description
     input_state = {
-        "user_description": """Create an MCP server that provides tools for:
+        **DEFAULT_INPUT_STATE,
+        "input_type": InputType.DESCRIPTION,
+        "input_data": """Create an MCP server that provides tools for:
         1. Searching GitHub repositories by topic or language
         2. Getting repository details including stars, forks, and description
         3. Listing recent commits for a repository
@@ -70,13 +79,6 @@ async def generate_from_description_example():
         
         The server should handle authentication via GitHub personal access token.""",
         "max_iterations": 5,
-        "current_iteration": 0,
-        "deployment_stage": "none",
-        "errors": [],
-        "test_results": [],
-        "validation_errors": [],
-        "refinement_history": [],
-        "mcp_server_code": {},
     }
     
     # Configuration
@@ -87,13 +89,15 @@ async def generate_from_description_example():
             "freestyle_api_key": os.getenv("FREESTYLE_API_KEY"),
             "use_local_freestyle": True,
             "max_iterations": 5,
+            "http_client": http_client,
+            "anthropic_prompt_cache": True,
         }
     }
     
     print("Generating MCP server from description...")
     
     # Run the agent
-    result = await graph.ainvoke(input_state, config)
+    result = await cached_ainvoke(graph, input_state, config, cache=cache)
     
     # Print results
     print(f"\nFinal status: {result.get('current_phase')}")
@@ -112,21 +116,74 @@ async def generate_from_description_example():
     return result
 
 
+async def run_all(
+    http_client: Optional[httpx.AsyncClient] = None,
+    cache: Optional[ResultCache] = None,
+):
+    """Run both examples concurrently."""
+    return await asyncio.gather(
+        generate_from_openapi_example(http_client, cache),
+        generate_from_description_example(http_client, cache),
+        return_exceptions=True,
+    )
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the HTTP client shared by every graph invocation."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        timeout=60,
+    )
+
+
 async def main():
     """Run examples."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Run both examples concurrently instead of prompting for one",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerate even if an identical run was completed recently",
+    )
+    args = parser.parse_args()
+    cache = None if args.no_cache else ResultCache()
+    
     print("MCP Generator Examples")
     print("=" * 50)
     
-    # Choose which example to run
-    choice = input("\nSelect example:\n1. Generate from OpenAPI spec\n2. Generate from description\nChoice (1 or 2): ")
-    
-    if choice == "1":
-        await generate_from_openapi_example()
-    elif choice == "2":
-        await generate_from_description_example()
-    else:
-        print("Invalid choice")
+    try:
+        if args.all:
+            async with create_http_client() as http_client:
+                results = await run_all(http_client, cache)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Example failed: {result}")
+            return
+        
+        # Choose which example to run
+        choice = input("\nSelect example:\n1. Generate from OpenAPI spec\n2. Generate from description\nChoice (1 or 2): ")
+        
+        async with create_http_client() as http_client:
+            if choice == "1":
+                await generate_from_openapi_example(http_client, cache)
+            elif choice == "2":
+                await generate_from_description_example(http_client, cache)
+            else:
+                print("Invalid choice")
+    finally:
+        # Close the pooled client used by calls that weren't given http_client
+        await aclose_shared_client()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop is an optional, faster drop-in event loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -6,83 +6,96 @@ This script demonstrates how to generate an MCP server and save its endpoint
 to your Supabase database automatically.
 """
 
+import argparse
 import asyncio
 import os
-from src.agent.graph import graph, InputType
+import sys
+from typing import Optional
+
+import httpx
+
+from src.agent.cache import ResultCache, cached_ainvoke
+from src.agent.graph import graph, aclose_shared_client, InputType, DEFAULT_INPUT_STATE
+
+# Required environment variables for Supabase
+REQUIRED_ENV_VARS = (
+    "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY",
+    "ANTHROPIC_API_KEY",
+    "FREESTYLE_API_KEY",
+    "MORPH_API_KEY",
+)
+
 
 async def main():
     """Generate an MCP server and save it to Supabase."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerate even if an identical run was completed recently",
+    )
+    args = parser.parse_args()
+    cache = None if args.no_cache else ResultCache()
     
-    # Required environment variables for Supabase
-    required_env_vars = [
-        "NEXT_PUBLIC_SUPABASE_URL",
-        "NEXT_PUBLIC_SUPABASE_ANON_KEY",
-        "ANTHROPIC_API_KEY",
-        "FREESTYLE_API_KEY",
-        "MORPH_API_KEY"
-    ]
-    
-    missing_vars = [var for var in required_env_vars if not os.getenv(var)]
+    env = dict(os.environ)
+    missing_vars = tuple(var for var in REQUIRED_ENV_VARS if not env.get(var))
     if missing_vars:
-        print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
-        print("\nPlease set these environment variables:")
-        for var in missing_vars:
-            print(f"  export {var}=your_value_here")
+        sys.stderr.write(
+            f"❌ Missing required environment variables: {', '.join(missing_vars)}\n"
+            "\nPlease set these environment variables:\n"
+            + "".join(f"  export {var}=your_value_here\n" for var in missing_vars)
+        )
         return
     
     # Example 1: Generate from OpenAPI spec
-    print("🚀 Generating MCP server from OpenAPI spec...")
-    
     initial_state = {
+        **DEFAULT_INPUT_STATE,
         "input_type": InputType.OPENAPI,
         "input_data": "https://api.example.com/openapi.json",  # Replace with your OpenAPI URL
         "project_id": "your-project-id-here",  # Replace with your Supabase project ID
-        "validation_errors": [],
-        "current_iteration": 0,
-        "max_iterations": 3,
-        "errors": []
     }
-    
-    try:
-        result = await graph.ainvoke(initial_state)
-        
-        if result["current_phase"] == "completed":
-            print("✅ MCP server generated and deployed successfully!")
-            print(f"📊 Repository ID: {result.get('repo_id')}")
-            print(f"🌐 Server URL: {result.get('dev_server_info', {}).get('ephemeral_url')}")
-            
-            if result.get('mcp_id'):
-                print(f"💾 Saved to Supabase with MCP ID: {result['mcp_id']}")
-            else:
-                print("⚠️  MCP deployed but not saved to database")
-                
-        else:
-            print(f"❌ Generation failed in phase: {result['current_phase']}")
-            if result.get('errors'):
-                for error in result['errors']:
-                    print(f"  - {error['phase']}: {error['error']}")
-                    
-    except Exception as e:
-        print(f"❌ Error: {e}")
 
     # Example 2: Generate from description
-    print("\n🚀 Generating MCP server from description...")
-    
     description_state = {
+        **DEFAULT_INPUT_STATE,
         "input_type": InputType.DESCRIPTION,
         "input_data": "Create an MCP server that provides weather information for any city",
         "project_id": "your-project-id-here",  # Replace with your Supabase project ID
-        "validation_errors": [],
-        "current_iteration": 0,
-        "max_iterations": 3,
-        "errors": []
     }
     
+    # The two generations are independent, so run them concurrently
+    # and let them share one connection pool
     try:
-        result = await graph.ainvoke(description_state)
+        async with httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            timeout=60
+        ) as http_client:
+            await asyncio.gather(
+                run_example("OpenAPI spec", initial_state, http_client, cache),
+                run_example("description", description_state, http_client, cache),
+            )
+    finally:
+        # Close the pooled client used by calls that weren't given http_client
+        await aclose_shared_client()
+
+
+async def run_example(
+    label: str,
+    state: dict,
+    http_client: httpx.AsyncClient,
+    cache: Optional[ResultCache] = None
+):
+    """Run the graph for a single example and print the outcome."""
+    print(f"🚀 Generating MCP server from {label}...")
+    
+    try:
+        result = await cached_ainvoke(
+            graph, state, {"configurable": {"http_client": http_client}}, cache=cache
+        )
         
         if result["current_phase"] == "completed":
-            print("✅ MCP server generated and deployed successfully!")
+            print(f"✅ [{label}] MCP server generated and deployed successfully!")
             print(f"📊 Repository ID: {result.get('repo_id')}")
             print(f"🌐 Server URL: {result.get('dev_server_info', {}).get('ephemeral_url')}")
             
@@ -92,13 +105,19 @@ async def main():
                 print("⚠️  MCP deployed but not saved to database")
                 
         else:
-            print(f"❌ Generation failed in phase: {result['current_phase']}")
+            print(f"❌ [{label}] Generation failed in phase: {result['current_phase']}")
             if result.get('errors'):
                 for error in result['errors']:
                     print(f"  - {error['phase']}: {error['error']}")
                     
     except Exception as e:
-        print(f"❌ Error: {e}")
+        print(f"❌ [{label}] Error: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop is an optional, faster drop-in event loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
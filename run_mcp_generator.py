@@ -1,40 +1,98 @@
 #!/usr/bin/env python
 """Quick script to run the MCP Generator agent."""
 
+import argparse
 import asyncio
+import atexit
+import logging
 import os
+import queue
 import sys
-from dotenv import load_dotenv
+from logging.handlers import QueueHandler, QueueListener
 
-from src.agent.graph import graph, InputType
+import httpx
 
-# Load environment variables
-load_dotenv()
+from src.agent.cache import ResultCache, cached_ainvoke
+from src.agent.checkpoint import ainvoke_resumable, open_sqlite_checkpointer
+from src.agent.graph import graph, aclose_shared_client, create_mcp_generator_graph, InputType, DEFAULT_INPUT_STATE
+
+# Environment variables from .env are loaded when the graph module is imported
+REQUIRED_VARS = (
+    "ANTHROPIC_API_KEY",
+    "FREESTYLE_API_KEY",
+    "MORPH_API_KEY",
+)
+
+# Loggers --verbose turns up to DEBUG. graph.py imports the tools package
+# by its top-level name, so its loggers are "tools.*" rather than "src.tools.*".
+PROJECT_LOGGERS = ("src.agent", "tools")
+
+
+def configure_logging(verbose: bool) -> None:
+    """Send log records through a queue so the event loop never blocks writing them.
+    
+    The agent's nodes log from inside the event loop; the QueueListener
+    thread does the actual (possibly slow) writes to stderr.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, logging.StreamHandler())
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        handlers=[QueueHandler(log_queue)]
+    )
+    if verbose:
+        # Debug output only from our own code, not httpx, anthropic, etc.
+        for name in PROJECT_LOGGERS:
+            logging.getLogger(name).setLevel(logging.DEBUG)
+    listener.start()
+    # Flush anything still queued when the script exits
+    atexit.register(listener.stop)
 
 
 async def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerate even if an identical run was completed recently",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--openapi", help="OpenAPI spec URL to generate from")
+    source.add_argument("--description", help="Natural language description of the MCP server")
+    parser.add_argument("--project-id", help="Supabase project ID to save the MCP server under")
+    parser.add_argument(
+        "--thread-id",
+        help="Checkpoint the run under this ID; re-running with the same ID after "
+             "a failure resumes from the last successful step"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show debug logging from the agent")
+    args = parser.parse_args()
+    
+    configure_logging(args.verbose)
+    
+    # Only prompt when a person is at the terminal and nothing was passed on the command line
+    interactive = sys.stdin.isatty() and not (args.openapi or args.description)
+    
     print("MCP Generator Agent with Supabase Integration")
     print("=" * 60)
     
-    # Check for required environment variables
-    required_vars = [
-        "ANTHROPIC_API_KEY",
-        "FREESTYLE_API_KEY", 
-        "MORPH_API_KEY"
-    ]
+    # Snapshot the environment once instead of repeated os.getenv lookups
+    env = dict(os.environ)
     
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    # Check for required environment variables
+    missing_vars = tuple(var for var in REQUIRED_VARS if not env.get(var))
     if missing_vars:
-        print(f"\n❌ Missing required environment variables: {', '.join(missing_vars)}")
-        print("\nPlease set these in your .env file:")
-        for var in missing_vars:
-            print(f"  {var}=your_value_here")
+        sys.stderr.write(
+            f"\n❌ Missing required environment variables: {', '.join(missing_vars)}\n"
+            "\nPlease set these in your .env file:\n"
+            + "".join(f"  {var}=your_value_here\n" for var in missing_vars)
+        )
         return
     
     # Check for Supabase variables (optional but recommended)
-    supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+    supabase_url = env.get("NEXT_PUBLIC_SUPABASE_URL")
+    supabase_key = env.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
     
     if not supabase_url or not supabase_key:
         print("\n⚠️  Supabase environment variables not set.")
@@ -45,56 +103,61 @@ async def main():
         print()
     
     # Get project ID for Supabase
-    project_id = None
-    if supabase_url and supabase_key:
+    project_id = args.project_id
+    if project_id is None and supabase_url and supabase_key and interactive:
         project_id = input("Enter your Supabase project ID (or press Enter to skip database saving): ").strip()
-        if not project_id:
-            print("⚠️  Skipping database saving (no project ID provided)")
+    if supabase_url and supabase_key and not project_id:
+        print("⚠️  Skipping database saving (no project ID provided)")
     
     # Get input type
-    print("\nHow would you like to generate an MCP server?")
-    print("1. From OpenAPI specification URL")
-    print("2. From natural language description")
-    
-    choice = input("\nEnter your choice (1 or 2): ").strip()
+    if args.openapi:
+        choice = "1"
+    elif args.description:
+        choice = "2"
+    elif interactive:
+        print("\nHow would you like to generate an MCP server?")
+        print("1. From OpenAPI specification URL")
+        print("2. From natural language description")
+        
+        choice = input("\nEnter your choice (1 or 2): ").strip()
+    else:
+        print("❌ Pass --openapi or --description when not running interactively")
+        return
     
     if choice == "1":
         # OpenAPI input
-        openapi_url = input("\nEnter OpenAPI spec URL: ").strip()
+        openapi_url = (args.openapi or input("\nEnter OpenAPI spec URL: ")).strip()
         
         if not (openapi_url.startswith("http://") or openapi_url.startswith("https://")):
             print("❌ Please provide a valid HTTP/HTTPS URL")
             return
             
         input_state = {
+            **DEFAULT_INPUT_STATE,
             "input_type": InputType.OPENAPI,
             "input_data": openapi_url,
-            "project_id": project_id or "",
-            "validation_errors": [],
-            "current_iteration": 0,
-            "max_iterations": 3,
-            "errors": []
+            "project_id": project_id or ""
         }
     
     elif choice == "2":
         # Description input
-        print("\nDescribe the MCP server you want to create.")
-        print("Example: Create an MCP server with tools for searching GitHub repos and creating issues")
-        
-        description = input("\nYour description: ").strip()
+        description = args.description
+        if description is None:
+            print("\nDescribe the MCP server you want to create.")
+            print("Example: Create an MCP server with tools for searching GitHub repos and creating issues")
+            
+            description = input("\nYour description: ")
+        description = description.strip()
         
         if not description:
             print("❌ Description cannot be empty")
             return
             
         input_state = {
+            **DEFAULT_INPUT_STATE,
             "input_type": InputType.DESCRIPTION,
             "input_data": description,
-            "project_id": project_id or "",
-            "validation_errors": [],
-            "current_iteration": 0,
-            "max_iterations": 3,
-            "errors": []
+            "project_id": project_id or ""
         }
     
     else:
@@ -106,7 +169,30 @@ async def main():
     print("🔄 This may take a few minutes...")
     
     try:
-        result = await graph.ainvoke(input_state)
+        # Share one connection pool across every HTTP call made during the run
+        async with httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            timeout=60
+        ) as http_client:
+            config = {"configurable": {
+                "http_client": http_client,
+                "anthropic_prompt_cache": True
+            }}
+            if args.thread_id:
+                config["configurable"]["thread_id"] = args.thread_id
+                async with open_sqlite_checkpointer() as checkpointer:
+                    result = await ainvoke_resumable(
+                        create_mcp_generator_graph(checkpointer=checkpointer),
+                        input_state,
+                        config
+                    )
+            else:
+                result = await cached_ainvoke(
+                    graph,
+                    input_state,
+                    config,
+                    cache=None if args.no_cache else ResultCache()
+                )
         
         print(f"\n{'='*60}")
         print("🎉 GENERATION RESULTS")
@@ -148,7 +234,16 @@ async def main():
     except Exception as e:
         print(f"\n❌ Error during generation: {e}")
         print("\nTip: Check your environment variables and network connection")
+    finally:
+        # Close the pooled client used by calls that weren't given http_client
+        await aclose_shared_client()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop is an optional, faster drop-in event loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -4,6 +4,6 @@ This agent generates MCP servers from OpenAPI specs or natural language descript
 deploys them to Freestyle.sh, tests them, and uses Morph LLM for refinements.
 """
 
-from .graph import graph, MCPGeneratorState, Configuration
+from .graph import graph, MCPGeneratorState, Configuration, DEFAULT_INPUT_STATE
 
-__all__ = ["graph", "MCPGeneratorState", "Configuration"]
+__all__ = ["graph", "MCPGeneratorState", "Configuration", "DEFAULT_INPUT_STATE"]
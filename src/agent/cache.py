@@ -0,0 +1,120 @@
+"""Persistent cache for MCP Generator graph results."""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import orjson
+from langchain_core.runnables import RunnableConfig
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp-generator")
+DEFAULT_TTL = 3600  # Freestyle dev servers are ephemeral, so don't reuse results forever
+DEFAULT_MEMORY_SIZE = 256
+
+
+def cache_key(input_state: Mapping[str, Any], configurable: Optional[Mapping[str, Any]] = None) -> str:
+    """Hash the graph input and the non-secret configuration into a cache key."""
+    cfg = {
+        k: v for k, v in (configurable or {}).items()
+        if "key" not in k and k != "http_client"
+    }
+    payload = orjson.dumps({"state": input_state, "cfg": cfg}, default=str, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed cache of graph results stored as JSON files on disk.
+
+    Recent entries are also kept in memory (least recently used first out)
+    so repeat lookups in a long-running process skip the file read.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, memory_size: int = DEFAULT_MEMORY_SIZE):
+        """Store entries under ``cache_dir``, keeping up to ``memory_size`` in memory."""
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self._memory: OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]] = OrderedDict()
+
+    def _remember(self, key: str, expires_at: Optional[float], value: Dict[str, Any]) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Tuple[Optional[float], Dict[str, Any]]]:
+        try:
+            with open(self._path(key), "rb") as f:
+                entry = orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        return entry.get("expires_at"), entry.get("value")
+
+    def _write(self, key: str, value: Dict[str, Any], expires_at: Optional[float]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {"expires_at": expires_at, "value": value}
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(orjson.dumps(entry, default=str))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for ``key``, or None if missing or expired."""
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._read, key)
+            if entry is None or entry[1] is None:
+                return None
+            self._remember(key, *entry)
+        else:
+            self._memory.move_to_end(key)
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.time():
+            self._memory.pop(key, None)
+            return None
+        # Copy so a caller editing its result can't change the cached entry
+        return dict(value)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = DEFAULT_TTL) -> None:
+        """Store ``value`` under ``key`` for ``ttl`` seconds (forever if None)."""
+        expires_at = time.time() + ttl if ttl is not None else None
+        await asyncio.to_thread(self._write, key, value, expires_at)
+        self._remember(key, expires_at, value)
+
+
+async def cached_ainvoke(
+    graph: Any,
+    input_state: Dict[str, Any],
+    config: Optional[RunnableConfig] = None,
+    cache: Optional[ResultCache] = None,
+    ttl: Optional[float] = DEFAULT_TTL,
+) -> Dict[str, Any]:
+    """Run ``graph.ainvoke`` unless an identical completed run is cached.
+
+    Pass ``cache=None`` to always run the graph. Only completed runs are
+    stored so that failures are retried on the next invocation.
+    """
+    if cache is None:
+        return await graph.ainvoke(input_state, config)
+
+    key = cache_key(input_state, (config or {}).get("configurable"))
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = await graph.ainvoke(input_state, config)
+    if result.get("current_phase") == "completed":
+        await cache.set(key, result, ttl)
+    return result
@@ -0,0 +1,80 @@
+"""Resume failed MCP Generator runs from their last successful step."""
+
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from .cache import DEFAULT_CACHE_DIR
+from .graph import InputType, Phase
+
+DEFAULT_CHECKPOINT_DB = os.path.join(DEFAULT_CACHE_DIR, "checkpoints.db")
+
+
+@asynccontextmanager
+async def open_sqlite_checkpointer(path: str = DEFAULT_CHECKPOINT_DB) -> AsyncIterator[Any]:
+    """Open a SQLite checkpointer that can restore this graph's state.
+
+    Requires the optional ``langgraph-checkpoint-sqlite`` package.
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    # The state holds our enums, which the serializer only restores if allowed
+    serde = JsonPlusSerializer(allowed_msgpack_modules=[
+        (Phase.__module__, Phase.__name__),
+        (InputType.__module__, InputType.__name__),
+    ])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    async with aiosqlite.connect(path) as conn:
+        yield AsyncSqliteSaver(conn, serde=serde)
+
+
+async def find_resume_config(graph: Any, config: RunnableConfig) -> Optional[RunnableConfig]:
+    """Return a config pointing at the last good checkpoint of a failed run.
+
+    Nodes record failures in state instead of raising, so a failed run
+    still reaches END. This walks the thread's history (newest first) and
+    picks the latest checkpoint that has work left to do and was not
+    written by a failed node. Checkpoints carrying a deploy_prep_error are
+    skipped too, so prepare_deploy runs again (e.g. after a transient
+    repo-creation failure). Returns None if the thread has no history or
+    its latest run did not fail.
+    """
+    latest = await graph.aget_state(config)
+    if not latest.values or latest.values.get("current_phase") != "failed":
+        return None
+
+    async for snapshot in graph.aget_state_history(config):
+        values = snapshot.values
+        if snapshot.next and values.get("current_phase") != "failed" and not values.get("deploy_prep_error"):
+            # Keep the caller's configurable values (e.g. http_client) and
+            # add the checkpoint to fork from
+            return {
+                **config,
+                "configurable": {
+                    **config.get("configurable", {}),
+                    **snapshot.config["configurable"],
+                },
+            }
+    return None
+
+
+async def ainvoke_resumable(
+    graph: Any,
+    input_state: Dict[str, Any],
+    config: RunnableConfig,
+) -> Dict[str, Any]:
+    """Run ``graph``, resuming the thread's failed run instead of starting over.
+
+    ``graph`` must be compiled with a checkpointer and ``config`` must set
+    ``configurable.thread_id``. If the thread's last run failed, the steps
+    that succeeded (e.g. generation and deployment) are not repeated and
+    ``input_state`` is ignored; otherwise a fresh run starts from it.
+    """
+    resume_config = await find_resume_config(graph, config)
+    if resume_config is not None:
+        return await graph.ainvoke(None, resume_config)
+    return await graph.ainvoke(input_state, config)
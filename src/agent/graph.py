@@ -1,21 +1,31 @@
 """MCP Generator LangGraph Agent with ReAct Agent for Refinement."""
 
 import asyncio
-import json
+import functools
+import hashlib
+import logging
+import operator
 import os
+import shutil
 import tempfile
+import time
+from collections import OrderedDict
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional, TypedDict
+from types import MappingProxyType
+from typing import Annotated, Any, Dict, Final, Iterator, List, Optional, Set, Tuple, TypedDict
 
-import aiofiles
-import aiofiles.tempfile
 import httpx
+import orjson
 
 from langchain.chat_models import init_chat_model
+from langchain_core.caches import BaseCache
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import HumanMessage
-from langgraph.graph import END, StateGraph
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.errors import GraphRecursionError
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -31,43 +41,113 @@ from tools import (
     freestyle_test_mcp_server,
     freestyle_deploy_production
 )
+from tools.http_client import get_http_client
+# Re-exported so entry points close the same client the tools use (`tools` is
+# only importable through the path set up above)
+from tools.http_client import aclose_shared_client  # noqa: F401
+
+try:
+    # On-disk caches (LLM responses, generator output) share the result cache's directory
+    from .cache import DEFAULT_CACHE_DIR
+except ImportError:
+    # langgraph.json loads this file by path, outside the package; the
+    # package itself is installed as a dependency
+    from agent.cache import DEFAULT_CACHE_DIR
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# API keys, resolved once after .env is loaded rather than on every node run
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+FREESTYLE_API_KEY = os.getenv("FREESTYLE_API_KEY")
+MORPH_API_KEY = os.getenv("MORPH_API_KEY")
+
 # Supabase configuration
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 
 if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    print("WARNING: Supabase environment variables not set. Database operations will be disabled.")
+    logger.warning("Supabase environment variables not set. Database operations will be disabled.")
+
+# Endpoint and headers for inserting MCP records; these never change at runtime
+SUPABASE_MCP_ENDPOINT = f"{SUPABASE_URL}/rest/v1/mcp"
+SUPABASE_HEADERS = MappingProxyType({
+    "apikey": SUPABASE_ANON_KEY or "",
+    "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
+    "Content-Type": "application/json",
+    "Prefer": "return=representation"
+})
+
+
+def _create_llm_cache() -> Optional[BaseCache]:
+    """Create the LLM response cache, or None when langchain-community isn't installed.
+    
+    Only a persistent cache is worth having: generated servers are large and
+    a process rarely sees the same description twice, so an in-memory cache
+    would mostly hold entries that are never hit.
+    """
+    try:
+        from langchain_community.cache import SQLiteCache
+    except ImportError:
+        return None
+    
+    os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+    return SQLiteCache(database_path=os.path.join(DEFAULT_CACHE_DIR, "llm_cache.db"))
+
 
 # Initialize the LLM once
-anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-print(f"DEBUG: Initializing LLM with Anthropic key: {'SET' if anthropic_key else 'NOT SET'} (length: {len(anthropic_key) if anthropic_key else 0})")
+logger.debug("Initializing LLM with Anthropic key: %s", "SET" if ANTHROPIC_API_KEY else "NOT SET")
 
 try:
+    llm_cache = _create_llm_cache()
+    # Sonnet generates servers from descriptions, where output quality matters most
     llm = init_chat_model(
         "anthropic:claude-3-5-sonnet-20241022",
         temperature=0.1,
-        anthropic_api_key=anthropic_key,
+        anthropic_api_key=ANTHROPIC_API_KEY,
+        # With the SQLite cache, identical prompts (e.g. re-running the same
+        # description) skip the API call; without it generation streams
+        cache=llm_cache,
+    )
+    # Haiku drives the ReAct test/fix/deploy loop, where each step's latency adds up.
+    # Its edit tool calls (morph_apply_edit, file writes) carry whole file bodies,
+    # so the output cap must leave room for them or the arguments get truncated.
+    # It stays uncached: each step answers live tool output, so a cached reply
+    # would replay an action decided against a different server state.
+    llm_fast = init_chat_model(
+        "anthropic:claude-haiku-4-5",
+        temperature=0.1,
+        max_tokens=4096,
+        anthropic_api_key=ANTHROPIC_API_KEY,
     )
-    print("DEBUG: LLM initialized successfully")
+    logger.debug("LLM initialized successfully")
 except Exception as llm_error:
-    print(f"DEBUG: LLM initialization failed: {type(llm_error).__name__}: {str(llm_error)}")
+    logger.error("LLM initialization failed: %s: %s", type(llm_error).__name__, llm_error)
     raise llm_error
 
 
+class MCPFiles(BaseModel):
+    """Files making up a generated MCP server."""
+    files: Dict[str, str]
+
+
+# Structured output makes the model return a validated file map (no JSON parsing step)
+structured_llm = llm.with_structured_output(MCPFiles)
+
+
 # Supabase Database Functions
 async def save_mcp_to_database(
     project_id: str,
     name: str, 
     mcp_url: str,
-    description: Optional[str] = None
+    description: Optional[str] = None,
+    config: Optional[RunnableConfig] = None
 ) -> Optional[str]:
     """Save MCP server info to Supabase database."""
     if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-        print("WARNING: Supabase not configured, skipping database save")
+        logger.warning("Supabase not configured, skipping database save")
         return None
     
     try:
@@ -88,33 +168,28 @@ async def save_mcp_to_database(
         }
         
         # Make the API call to Supabase
-        async with httpx.AsyncClient() as client:
+        async with get_http_client(config) as client:
             response = await client.post(
-                f"{SUPABASE_URL}/rest/v1/mcp",
-                headers={
-                    "apikey": SUPABASE_ANON_KEY,
-                    "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
-                    "Content-Type": "application/json",
-                    "Prefer": "return=representation"
-                },
-                json=mcp_data
+                SUPABASE_MCP_ENDPOINT,
+                headers=SUPABASE_HEADERS,
+                content=orjson.dumps(mcp_data)
             )
             
             if response.status_code == 201:
-                result = response.json()
+                result = orjson.loads(response.content)
                 if isinstance(result, list) and len(result) > 0:
                     mcp_id = result[0].get("id")
-                    print(f"DEBUG: Successfully saved MCP to database with ID: {mcp_id}")
+                    logger.debug("Successfully saved MCP to database with ID: %s", mcp_id)
                     return mcp_id
                 else:
-                    print(f"DEBUG: Unexpected response format: {result}")
+                    logger.debug("Unexpected response format: %s", result)
                     return None
             else:
-                print(f"DEBUG: Failed to save MCP to database. Status: {response.status_code}, Response: {response.text}")
+                logger.debug("Failed to save MCP to database. Status: %s, Response: %s", response.status_code, response.text)
                 return None
                 
     except Exception as e:
-        print(f"DEBUG: Error saving MCP to database: {type(e).__name__}: {str(e)}")
+        logger.debug("Error saving MCP to database: %s: %s", type(e).__name__, e)
         return None
 
 
@@ -141,28 +216,286 @@ class MCPGeneratorState(TypedDict):
     input_data: str  # OpenAPI URL or description
     project_id: str  # Supabase project ID for linking the MCP
     
-    # Generation outputs
+    # Generation outputs (cleared once uploaded to the dev server)
     mcp_server_files: Optional[Dict[str, str]]
     
     # Deployment info
+    repo_name: Optional[str]
+    deploy_prep_error: Optional[str]  # Set by prepare_deploy, raised by deploy_dev
     repo_id: Optional[str]
     dev_server_info: Optional[Dict[str, Any]]
     
-    # Testing and refinement
-    validation_errors: List[str]
+    # Testing and refinement (list fields are appended to, not replaced,
+    # so nodes return only their new entries)
+    validation_errors: Annotated[List[str], operator.add]
     current_iteration: int
     max_iterations: int
     
     # Status tracking
     current_phase: Phase
-    errors: List[Dict[str, str]]
+    errors: Annotated[List[Dict[str, str]], operator.add]
     completed_at: Optional[str]
     
     # Database tracking
     mcp_id: Optional[str]  # Supabase MCP record ID
 
 
+# Shared, read-only defaults for a fresh run. Callers build their input with
+# {**DEFAULT_INPUT_STATE, "input_type": ..., "input_data": ...}. The list
+# fields are left out because their reducers start them empty.
+DEFAULT_INPUT_STATE = MappingProxyType({
+    "current_iteration": 0,
+    "max_iterations": 3,
+})
+
+
+class Configuration(TypedDict, total=False):
+    """Configurable parameters for the MCP Generator agent."""
+    # Long-lived client reused for outgoing HTTP calls (Supabase, Morph, MCP tests)
+    http_client: Optional[httpx.AsyncClient]
+    # Mark static prompt prefixes with Anthropic cache_control breakpoints
+    anthropic_prompt_cache: bool
+
+
+def _text_block(text: str, cache: bool = False) -> Dict[str, Any]:
+    """Build a text content block, optionally tagged as an Anthropic cache breakpoint."""
+    block: Dict[str, Any] = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def _prompt_cache_enabled(config: RunnableConfig) -> bool:
+    """Return whether Anthropic prompt caching was requested via ``configurable``."""
+    return bool((config or {}).get("configurable", {}).get("anthropic_prompt_cache"))
+
+
+# System prompt for generating a server from a description. The description is
+# sent as the user message after it, so this prefix is the same on every call.
+GENERATION_INSTRUCTIONS: Final = """Generate a complete MCP server based on the user's description.
+
+Create a Node.js MCP server with:
+1. package.json with proper dependencies
+2. index.js as the main server file
+3. Any additional files needed
+
+Return every file in `files` as a filename -> content mapping."""
+
+
+# Prompt for the ReAct agent that tests and deploys the generated server
+REACT_AGENT_PROMPT: Final = """You deploy MCP servers. Steps:
+1. Call freestyle_test_mcp_server on the server URL.
+2. If it passes (any status under 500), call freestyle_deploy_production with the repo ID.
+3. If it fails, the server may not be running: debug with the dev server tools if the cause is clear, otherwise report it.
+Only use morph_apply_edit if absolutely necessary. Be brief."""
+
+# The same prompt as a system message marked as an Anthropic cache breakpoint
+REACT_AGENT_CACHED_PROMPT: Final = SystemMessage(content=[_text_block(REACT_AGENT_PROMPT, cache=True)])
+
+
+# Wall-clock limit for one ReAct agent run, in seconds
+REACT_AGENT_TIMEOUT = 600
 
+# Final message create_react_agent substitutes when the step budget runs out
+REACT_AGENT_STEPS_EXHAUSTED_REPLY: Final = "Sorry, need more steps to process this request."
+
+
+# How long a server's tool list is reused before it is fetched again, in seconds
+MCP_TOOLS_TTL = 300
+
+# How many MCP servers' tools and agents are kept. Each run deploys to a new
+# dev server, so without a bound every run would leave an entry behind.
+MCP_CACHE_SIZE = 8
+
+# Tool lists and when they were requested, keyed by (server URL, API key) and
+# reused across runs, least recently used first. Storing the pending fetch means
+# concurrent runs for one server share it without blocking other servers; failed
+# fetches are dropped so they can be retried. The adapter opens a fresh session
+# per tool call, so there is no client connection to close on eviction.
+_MCP_TOOLS_CACHE: OrderedDict[Tuple[str, str], Tuple["asyncio.Future[List[Any]]", float]] = OrderedDict()
+
+# Compiled ReAct agents keyed by (server URL, API key, prompt caching enabled)
+_REACT_AGENT_CACHE: OrderedDict[Tuple[str, str, bool], Any] = OrderedDict()
+
+
+async def _get_mcp_tools(mcp_url: str, freestyle_api_key: str) -> List[Any]:
+    """Return the tools exposed by the MCP server at ``mcp_url``, fetching them once."""
+    try:
+        from langchain_mcp_adapters.client import MultiServerMCPClient
+    except ImportError as e:
+        raise Exception(f"Failed to import MCP adapters: {e}")
+    
+    key = (mcp_url, freestyle_api_key)
+    cached = _MCP_TOOLS_CACHE.get(key)
+    if cached is not None and time.monotonic() - cached[1] > MCP_TOOLS_TTL:
+        # Stale; agents compiled against the old tools go with it
+        _evict_mcp_tools(mcp_url, freestyle_api_key)
+        cached = None
+    
+    if cached is not None:
+        _MCP_TOOLS_CACHE.move_to_end(key)
+        tools = cached[0]
+    else:
+        client = MultiServerMCPClient({
+            "freestyle": {
+                "url": mcp_url,
+                "transport": "streamable_http",
+                "headers": {
+                    "x-api-key": freestyle_api_key
+                }
+            }
+        })
+        tools = asyncio.ensure_future(client.get_tools())
+        _MCP_TOOLS_CACHE[key] = (tools, time.monotonic())
+        while len(_MCP_TOOLS_CACHE) > MCP_CACHE_SIZE:
+            _evict_mcp_tools(*next(iter(_MCP_TOOLS_CACHE)))
+        
+        def forget_if_failed(future: "asyncio.Future[List[Any]]") -> None:
+            if future.cancelled() or future.exception() is not None:
+                entry = _MCP_TOOLS_CACHE.get(key)
+                if entry is not None and entry[0] is future:
+                    _evict_mcp_tools(mcp_url, freestyle_api_key)
+        
+        tools.add_done_callback(forget_if_failed)
+    
+    # Shield so one run being cancelled doesn't cancel the shared fetch
+    return await asyncio.shield(tools)
+
+
+def _evict_mcp_tools(mcp_url: str, freestyle_api_key: str) -> None:
+    """Drop cached MCP tools and agents so the next run reconnects to the server."""
+    _MCP_TOOLS_CACHE.pop((mcp_url, freestyle_api_key), None)
+    for prompt_cache in (False, True):
+        _REACT_AGENT_CACHE.pop((mcp_url, freestyle_api_key, prompt_cache), None)
+
+
+# Directories in generator output that are never part of the server source
+_SKIPPED_DIRS = frozenset({"node_modules", ".git"})
+
+
+def _iter_files(root: str) -> Iterator[str]:
+    """Yield paths of all files under ``root``, using scandir's cached entry types."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in _SKIPPED_DIRS:
+                    yield from _iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry.path
+
+
+def _read_text_file(path: str) -> str:
+    """Read a UTF-8 text file in a single binary read."""
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def _read_generated_files(root: str) -> Dict[str, str]:
+    """Read every file under ``root`` into a relative path -> content mapping."""
+    # Generator output is a few dozen small files that were just written and
+    # are still in the page cache, so a plain loop beats handing each read
+    # to a worker thread (the whole walk already runs off the event loop)
+    return {
+        os.path.relpath(filepath, root): _read_text_file(filepath)
+        for filepath in _iter_files(root)
+    }
+
+
+# Background cleanup tasks, referenced here so they aren't garbage collected mid-run
+_CLEANUP_TASKS: Set["asyncio.Task[None]"] = set()
+
+
+def _remove_tree_later(path: str) -> None:
+    """Delete ``path`` on a worker thread without making the caller wait for it."""
+    task = asyncio.create_task(asyncio.to_thread(shutil.rmtree, path, ignore_errors=True))
+    _CLEANUP_TASKS.add(task)
+    task.add_done_callback(_CLEANUP_TASKS.discard)
+
+
+@functools.cache
+def _generator_command() -> Tuple[str, ...]:
+    """Return the command that runs openapi-mcp-generator.
+    
+    A globally installed binary (see README) is executed directly, which
+    skips npx's package resolution on every run; npx is the fallback.
+    """
+    binary = shutil.which("openapi-mcp-generator")
+    if binary:
+        return (binary,)
+    return ("npx", "openapi-mcp-generator")
+
+
+async def _run_openapi_generator(spec_url: str) -> Dict[str, str]:
+    """Run openapi-mcp-generator for ``spec_url`` and return the generated files."""
+    tmpdir = await asyncio.to_thread(tempfile.mkdtemp)
+    try:
+        # Run the generator as a native async subprocess so no thread is
+        # pinned while npx works
+        proc = await asyncio.create_subprocess_exec(
+            *_generator_command(),
+            "--input", spec_url,
+            "--output", tmpdir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=120)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise Exception("openapi-mcp-generator timed out after 120 seconds")
+        
+        if proc.returncode != 0:
+            raise Exception(f"openapi-mcp-generator failed: {stderr.decode(errors='replace')}")
+        
+        return await asyncio.to_thread(_read_generated_files, tmpdir)
+    finally:
+        # The output (possibly including node_modules) is only needed until
+        # it has been read, so return without waiting for the delete
+        _remove_tree_later(tmpdir)
+
+
+# Cached openapi-mcp-generator output expires after a day in case the spec changes
+GENERATOR_CACHE_TTL = 24 * 60 * 60
+GENERATOR_CACHE_DISABLED = bool(os.getenv("MCP_GEN_CACHE_DISABLE"))
+
+
+def _generator_cache_path(spec_url: str) -> Optional[str]:
+    """Return the cache file for ``spec_url``, or None if caching is disabled."""
+    if GENERATOR_CACHE_DISABLED:
+        return None
+    key = hashlib.sha256(spec_url.encode()).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, f"openapi-{key}.json")
+
+
+def _load_generator_cache(spec_url: str) -> Optional[Dict[str, str]]:
+    """Return previously generated files for ``spec_url`` if a fresh copy is cached."""
+    path = _generator_cache_path(spec_url)
+    if path is None:
+        return None
+    try:
+        if os.path.getmtime(path) + GENERATOR_CACHE_TTL < time.time():
+            return None
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _store_generator_cache(spec_url: str, files: Dict[str, str]) -> None:
+    """Atomically write generated files for ``spec_url`` to the cache."""
+    path = _generator_cache_path(spec_url)
+    if path is None:
+        return
+    os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=DEFAULT_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(files))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 # Node Functions
@@ -177,99 +510,100 @@ async def generate_mcp_server(state: MCPGeneratorState, config: RunnableConfig)
             if not (spec_url.startswith("http://") or spec_url.startswith("https://")):
                 raise Exception(f"OpenAPI spec must be a valid URL, got: '{spec_url}'")
             
-            # Create temp directory in thread to avoid blocking
-            def run_openapi_generator():
-                import subprocess
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    # Run generator
-                    result = subprocess.run([
-                        "npx", "openapi-mcp-generator",
-                        "--input", spec_url,
-                        "--output", tmpdir
-                    ], capture_output=True, text=True, timeout=120)
-                    
-                    if result.returncode != 0:
-                        raise Exception(f"openapi-mcp-generator failed: {result.stderr}")
-                    
-                    # Read all files
-                    files = {}
-                    for root, _, filenames in os.walk(tmpdir):
-                        for filename in filenames:
-                            filepath = os.path.join(root, filename)
-                            rel_path = os.path.relpath(filepath, tmpdir)
-                            with open(filepath, 'r') as f:
-                                files[rel_path] = f.read()
-                    return files
-            
-            # Run everything in a thread
-            files = await asyncio.to_thread(run_openapi_generator)
+            # Reuse output from an earlier run on the same spec
+            files = await asyncio.to_thread(_load_generator_cache, spec_url)
+            if files is None:
+                files = await _run_openapi_generator(spec_url)
+                await asyncio.to_thread(_store_generator_cache, spec_url, files)
             updates["mcp_server_files"] = files
         
         else:  # DESCRIPTION
-            # Generate using LLM
-            prompt = f"""Generate a complete MCP server based on this description:
-                {state["input_data"]}
-
-                Create a Node.js MCP server with:
-                1. package.json with proper dependencies
-                2. index.js as the main server file
-                3. Any additional files needed
-
-                Return the files as JSON with filename -> content mapping."""
-
-            response = await llm.ainvoke([HumanMessage(content=prompt)])
+            # Generate using LLM. The static system prompt is marked as a cache
+            # breakpoint; the user's description comes after it.
+            messages = [
+                SystemMessage(content=[
+                    _text_block(GENERATION_INSTRUCTIONS, cache=_prompt_cache_enabled(config))
+                ]),
+                HumanMessage(content=f"Description:\n{state['input_data']}"),
+            ]
             
-            try:
-                files = json.loads(response.content)
-                updates["mcp_server_files"] = files
-            except json.JSONDecodeError:
-                raise Exception("Failed to parse LLM response as JSON")
-        
+            if llm.cache is not None:
+                # Streaming bypasses the LLM cache, so invoke when the persistent
+                # cache is configured and a repeated description is answered from it
+                result = await structured_llm.ainvoke(messages)
+            else:
+                # Stream the structured response so progress is visible as soon as
+                # the first token arrives; each item is the file map parsed so far
+                result = None
+                async for partial in structured_llm.astream(messages):
+                    if partial is None:
+                        continue
+                    if result is None:
+                        logger.debug("Receiving generated files from LLM...")
+                    result = partial
+            
+            if result is None or not result.files:
+                raise Exception("LLM did not return any files")
+            
+            updates["mcp_server_files"] = result.files
         updates["current_phase"] = Phase.DEPLOYING
         
     except Exception as e:
-        updates["errors"] = state.get("errors", []) + [
-            {"phase": "generation", "error": str(e)}
-        ]
+        updates["errors"] = [{"phase": "generation", "error": str(e)}]
         updates["current_phase"] = Phase.FAILED
     
     return updates
 
 
-async def deploy_to_dev_server(state: MCPGeneratorState, config: RunnableConfig) -> Dict[str, Any]:
-    """Deploy MCP server to Freestyle dev server."""
-    updates = {"current_phase": Phase.DEPLOYING}
+async def prepare_deployment(state: MCPGeneratorState, config: RunnableConfig) -> Dict[str, Any]:
+    """Do the deployment setup that doesn't depend on the generated files.
+    
+    Runs in parallel with generate_mcp_server and creates the (empty)
+    repository, so its round trip is off the critical path. It must not
+    write current_phase (generate owns it in this step), so a failure is
+    recorded in deploy_prep_error for deploy_dev to raise.
+    """
+    if not FREESTYLE_API_KEY:
+        return {"deploy_prep_error": "FREESTYLE_API_KEY environment variable required"}
     
+    repo_name = f"mcp-server-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
     try:
-        freestyle_api_key = os.getenv("FREESTYLE_API_KEY")
-        
-        if not freestyle_api_key:
-            raise Exception("FREESTYLE_API_KEY environment variable required")
-        
-        # Create repository
         repo_result = await freestyle_create_repo(
-            name=f"mcp-server-{datetime.now().strftime('%Y%m%d-%H%M%S')}",
-            project_files=state["mcp_server_files"],
-            freestyle_api_key=freestyle_api_key,
+            name=repo_name,
+            freestyle_api_key=FREESTYLE_API_KEY,
             public=True
         )
+    except Exception as e:
+        return {"deploy_prep_error": str(e)}
+    
+    # Clear any error left in the thread's state by an earlier failed attempt
+    return {"repo_name": repo_name, "repo_id": repo_result["repo_id"], "deploy_prep_error": None}
+
+
+async def deploy_to_dev_server(state: MCPGeneratorState, config: RunnableConfig) -> Dict[str, Any]:
+    """Deploy MCP server to Freestyle dev server."""
+    updates = {"current_phase": Phase.DEPLOYING}
+    
+    try:
+        if state.get("deploy_prep_error"):
+            raise Exception(state["deploy_prep_error"])
         
-        updates["repo_id"] = repo_result["repo_id"]
-        
-        # Request dev server and write the initial files
+        # The repository was created by prepare_deploy while generation ran.
+        # Request a dev server for it and write the initial files.
         dev_server_result = await freestyle_request_dev_server(
-            repo_id=repo_result["repo_id"],
-            freestyle_api_key=freestyle_api_key,
-            project_files=repo_result.get("project_files")
+            repo_id=state["repo_id"],
+            freestyle_api_key=FREESTYLE_API_KEY,
+            project_files=state["mcp_server_files"]
         )
         
         updates["dev_server_info"] = dev_server_result
+        # The code now lives in the Freestyle repo; don't carry it through the
+        # remaining checkpoints and the final (possibly cached) result
+        updates["mcp_server_files"] = None
         updates["current_phase"] = Phase.REFINING
         
     except Exception as e:
-        updates["errors"] = state.get("errors", []) + [
-            {"phase": "deployment", "error": str(e)}
-        ]
+        updates["errors"] = [{"phase": "deployment", "error": str(e)}]
         updates["current_phase"] = Phase.FAILED
     
     return updates
@@ -280,10 +614,7 @@ async def react_agent_workflow(state: MCPGeneratorState, config: RunnableConfig)
     updates = {"current_phase": Phase.REFINING}
     
     try:
-        morph_api_key = os.getenv("MORPH_API_KEY")
-        freestyle_api_key = os.getenv("FREESTYLE_API_KEY")
-        
-        if not morph_api_key or not freestyle_api_key:
+        if not MORPH_API_KEY or not FREESTYLE_API_KEY:
             raise Exception("Both MORPH_API_KEY and FREESTYLE_API_KEY environment variables required")
         
         # Get MCP server URL from dev server info
@@ -293,69 +624,31 @@ async def react_agent_workflow(state: MCPGeneratorState, config: RunnableConfig)
         if not mcp_url:
             raise Exception("No MCP server URL found in dev server info")
         
-        # Import MCP adapters
-        try:
-            from langchain_mcp_adapters.client import MultiServerMCPClient
-        except ImportError as e:
-            raise Exception(f"Failed to import MCP adapters: {e}")
-        
         # Connect to Freestyle's MCP server
         try:
-            print(f"DEBUG: Connecting to MCP server at {mcp_url}")
-            print(f"DEBUG: Using Freestyle API key: {freestyle_api_key[:10]}...{freestyle_api_key[-4:]}")
+            logger.debug("Connecting to MCP server at %s", mcp_url)
             
-            mcp_config = {
-                "freestyle": {
-                    "url": mcp_url,
-                    "transport": "streamable_http",
-                    "headers": {
-                        "x-api-key": freestyle_api_key
-                    }
-                }
-            }
-            print(f"DEBUG: MCP client config: {mcp_config}")
-            
-            client = MultiServerMCPClient(mcp_config)
-            print("DEBUG: MCP client created successfully")
-            
-            # Get tools from the MCP server
-            print("DEBUG: About to get tools from MCP server...")
+            # Get tools from the MCP server (reused if this server was seen before)
+            logger.debug("About to get tools from MCP server...")
             try:
-                mcp_tools = await client.get_tools()
-                print(f"DEBUG: Retrieved {len(mcp_tools)} MCP tools successfully")
+                mcp_tools = await _get_mcp_tools(mcp_url, FREESTYLE_API_KEY)
+                logger.debug("Retrieved %d MCP tools successfully", len(mcp_tools))
                 
                 # Log tool names for debugging
-                tool_names = [tool.name if hasattr(tool, 'name') else str(tool) for tool in mcp_tools]
-                print(f"DEBUG: MCP tool names: {tool_names}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    tool_names = [tool.name if hasattr(tool, 'name') else str(tool) for tool in mcp_tools]
+                    logger.debug("MCP tool names: %s", tool_names)
                 
             except Exception as tools_error:
-                print(f"DEBUG: Error getting tools: {type(tools_error).__name__}: {str(tools_error)}")
+                logger.debug("Error getting tools: %s: %s", type(tools_error).__name__, tools_error)
                 raise tools_error
             
         except Exception as e:
-            print(f"DEBUG: MCP connection failed: {type(e).__name__}: {str(e)}")
-            print(f"DEBUG: Full exception details: {repr(e)}")
-            if hasattr(e, '__cause__') and e.__cause__:
-                print(f"DEBUG: Exception cause: {type(e.__cause__).__name__}: {str(e.__cause__)}")
+            logger.debug("MCP connection failed: %r", e)
+            if e.__cause__:
+                logger.debug("Exception cause: %s: %s", type(e.__cause__).__name__, e.__cause__)
             raise Exception(f"Failed to connect to MCP server at {mcp_url}: {e}")
         
-        # Create the workflow prompt
-        prompt = """You are an MCP server deployment agent. Your job is simple:
-
-1. TEST the server using freestyle_test_mcp_server to see if it's accessible
-2. If test PASSES: Use freestyle_deploy_production to deploy to production
-3. If test FAILS: The server might not be running - you can try basic debugging with the available tools, but in most cases just report the issue
-
-The test simply checks if the server is responding. If it responds with any status code under 500, consider it successful.
-
-Available tools:
-- freestyle_test_mcp_server(mcp_url, freestyle_api_key): Test if server is accessible
-- freestyle_deploy_production(repo_id, freestyle_api_key): Deploy to production
-- readFile, writeFile, editFile, ls, exec, commitAndPush, npmInstall, npmLint: Basic dev server tools
-- morph_apply_edit: AI code editing (only use if absolutely necessary)
-
-Keep it simple: Test → Deploy if working → Done."""
-        
         # Combine MCP tools with our custom tools
         all_tools = mcp_tools + [
             morph_apply_edit,
@@ -363,10 +656,20 @@ Keep it simple: Test → Deploy if working → Done."""
             freestyle_deploy_production
         ]
         
-        print(f"DEBUG: Using {len(all_tools)} tools ({len(mcp_tools)} MCP + 3 custom)")
+        logger.debug("Using %d tools (%d MCP + 3 custom)", len(all_tools), len(mcp_tools))
         
-        # Create ReAct agent with all tools and prompt
-        react_agent = create_react_agent(llm, all_tools, prompt=prompt)
+        # Create ReAct agent with all tools and prompt, reusing one compiled for this server
+        prompt_cache = _prompt_cache_enabled(config)
+        agent_key = (mcp_url, FREESTYLE_API_KEY, prompt_cache)
+        react_agent = _REACT_AGENT_CACHE.get(agent_key)
+        if react_agent is not None:
+            _REACT_AGENT_CACHE.move_to_end(agent_key)
+        else:
+            prompt = REACT_AGENT_CACHED_PROMPT if prompt_cache else REACT_AGENT_PROMPT
+            react_agent = create_react_agent(llm_fast, all_tools, prompt=prompt)
+            _REACT_AGENT_CACHE[agent_key] = react_agent
+            while len(_REACT_AGENT_CACHE) > MCP_CACHE_SIZE:
+                _REACT_AGENT_CACHE.popitem(last=False)
         
         # Create the human input with current environment info
         human_input = f"""Current Environment:
@@ -380,47 +683,62 @@ Please test the MCP server, fix any issues, and deploy to production once workin
         # Run the ReAct agent
         try:
             # Check if Anthropic API key is available
-            anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not anthropic_api_key:
+            if not ANTHROPIC_API_KEY:
                 raise Exception("ANTHROPIC_API_KEY environment variable is required")
             
-            print(f"DEBUG: API Keys status:")
-            print(f"  - ANTHROPIC_API_KEY: {'SET' if anthropic_api_key else 'NOT SET'} (length: {len(anthropic_api_key) if anthropic_api_key else 0})")
-            print(f"  - FREESTYLE_API_KEY: {'SET' if freestyle_api_key else 'NOT SET'} (length: {len(freestyle_api_key) if freestyle_api_key else 0})")
-            print(f"  - MORPH_API_KEY: {'SET' if morph_api_key else 'NOT SET'} (length: {len(morph_api_key) if morph_api_key else 0})")
-            
             # Run ReAct agent with detailed logging
-            print(f"DEBUG: Starting ReAct agent with {len(all_tools)} tools")
-            print(f"DEBUG: Human input length: {len(human_input)} chars")
-            print(f"DEBUG: MCP URL: {mcp_url}")
+            logger.debug(
+                "Starting ReAct agent with %d tools, %d chars of input, MCP URL %s",
+                len(all_tools), len(human_input), mcp_url
+            )
             
+            max_iterations = state.get("max_iterations", 3)
             try:
-                print("DEBUG: About to invoke ReAct agent...")
-                result = await react_agent.ainvoke({
-                    "messages": [HumanMessage(content=human_input)]
-                })
-                print("DEBUG: ReAct agent completed successfully")
+                logger.debug("About to invoke ReAct agent...")
+                # Each tool round is two steps (model call, then tools), and the
+                # final answer needs two more: the prebuilt agent only answers
+                # if at least two steps remain. With this limit it gets
+                # max_iterations tool rounds and then replies (or gives up with
+                # REACT_AGENT_STEPS_EXHAUSTED_REPLY). The timeout bounds a hung
+                # tool or model call.
+                result = await asyncio.wait_for(
+                    react_agent.ainvoke(
+                        {"messages": [HumanMessage(content=human_input)]},
+                        {**config, "recursion_limit": 2 * max_iterations + 2}
+                    ),
+                    timeout=REACT_AGENT_TIMEOUT
+                )
+                logger.debug("ReAct agent completed successfully")
+            except asyncio.TimeoutError:
+                _evict_mcp_tools(mcp_url, FREESTYLE_API_KEY)
+                raise Exception(f"ReAct agent timed out after {REACT_AGENT_TIMEOUT} seconds")
+            except GraphRecursionError:
+                raise Exception(f"ReAct agent ran out of steps after {max_iterations} iterations")
             except Exception as agent_error:
-                print(f"DEBUG: ReAct agent error type: {type(agent_error).__name__}")
-                print(f"DEBUG: ReAct agent error message: {str(agent_error)}")
-                print(f"DEBUG: Full agent error details: {repr(agent_error)}")
-                
-                # Print the full traceback for better debugging
-                import traceback
-                print(f"DEBUG: Full traceback:")
-                print(traceback.format_exc())
+                # The server may have gone away; don't reuse its tools next time
+                _evict_mcp_tools(mcp_url, FREESTYLE_API_KEY)
                 
-                # Check if it's a schema-related error
-                if "schema" in str(agent_error).lower() or "$schema" in str(agent_error):
-                    print("DEBUG: Schema-related error detected")
+                # Log the full traceback for better debugging
+                logger.debug("ReAct agent error: %r", agent_error, exc_info=True)
                 
-                # Check if it's a rate limiting error
-                if "rate" in str(agent_error).lower() or "quota" in str(agent_error).lower():
-                    print("DEBUG: Rate limiting error detected")
+                if logger.isEnabledFor(logging.DEBUG):
+                    error_text = str(agent_error).lower()
+                    # Check if it's a schema-related error
+                    if "schema" in error_text:
+                        logger.debug("Schema-related error detected")
+                    # Check if it's a rate limiting error
+                    if "rate" in error_text or "quota" in error_text:
+                        logger.debug("Rate limiting error detected")
                 
                 # Re-raise with more context
                 raise Exception(f"ReAct agent failed - {type(agent_error).__name__}: {str(agent_error)}")
             
+            # Running out of steps ends the agent with a canned reply rather than
+            # an error; don't let an unfinished fix count as a completed run
+            messages = result.get("messages") or []
+            if messages and messages[-1].content == REACT_AGENT_STEPS_EXHAUSTED_REPLY:
+                raise Exception(f"ReAct agent ran out of steps after {max_iterations} iterations")
+            
             # Save MCP server info to database after successful deployment
             try:
                 # Generate a name based on the input data or timestamp
@@ -444,19 +762,20 @@ Please test the MCP server, fix any issues, and deploy to production once workin
                         project_id=state["project_id"],
                         name=mcp_name,
                         mcp_url=production_url,
-                        description=f"Generated from {state['input_type'].value}: {state['input_data'][:100]}..."
+                        description=f"Generated from {state['input_type'].value}: {state['input_data'][:100]}...",
+                        config=config
                     )
                     
                     if mcp_id:
                         updates["mcp_id"] = mcp_id
-                        print(f"DEBUG: MCP saved to database with ID: {mcp_id}")
+                        logger.debug("MCP saved to database with ID: %s", mcp_id)
                     else:
-                        print("DEBUG: Failed to save MCP to database, but deployment was successful")
+                        logger.debug("Failed to save MCP to database, but deployment was successful")
                 else:
-                    print("DEBUG: Missing production URL or project_id, skipping database save")
+                    logger.debug("Missing production URL or project_id, skipping database save")
             
             except Exception as db_error:
-                print(f"DEBUG: Database save failed but deployment succeeded: {type(db_error).__name__}: {str(db_error)}")
+                logger.debug("Database save failed but deployment succeeded: %s: %s", type(db_error).__name__, db_error)
                 # Don't fail the whole process if database save fails
             
             updates["current_phase"] = Phase.COMPLETED
@@ -465,39 +784,44 @@ Please test the MCP server, fix any issues, and deploy to production once workin
             
         except Exception as e:
             error_msg = f"ReAct agent failed: {type(e).__name__}: {str(e)}"
-            print(f"DEBUG: {error_msg}")  # Debug output
+            logger.debug(error_msg)
             raise Exception(error_msg)
         
     except Exception as e:
-        updates["errors"] = state.get("errors", []) + [
-            {"phase": "react_workflow", "error": str(e)}
-        ]
+        updates["errors"] = [{"phase": "react_workflow", "error": str(e)}]
         updates["current_phase"] = Phase.FAILED
     
     return updates
 
 
 # Create the graph
-def create_mcp_generator_graph() -> StateGraph:
-    """Create the MCP Generator LangGraph."""
+def create_mcp_generator_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledStateGraph:
+    """Create the MCP Generator LangGraph.
+    
+    Pass a ``checkpointer`` to persist state after every step so a failed
+    run can be resumed without redoing the steps that succeeded (see
+    agent.checkpoint).
+    """
     
     workflow = StateGraph(MCPGeneratorState)
     
-    # Add nodes - only 3 nodes!
+    # Add nodes
     workflow.add_node("generate", generate_mcp_server)
+    workflow.add_node("prepare_deploy", prepare_deployment)
     workflow.add_node("deploy_dev", deploy_to_dev_server)
     workflow.add_node("react_agent", react_agent_workflow)
     
-    # Add edges - simple linear flow
-    workflow.add_edge("generate", "deploy_dev")
+    # Generation and deploy preparation (including creating the repository)
+    # run in parallel from the start, and deploy_dev waits for both
+    workflow.add_edge(START, "generate")
+    workflow.add_edge(START, "prepare_deploy")
+    workflow.add_edge(["generate", "prepare_deploy"], "deploy_dev")
     workflow.add_edge("deploy_dev", "react_agent")
     workflow.add_edge("react_agent", END)
     
-    # Set entry point
-    workflow.set_entry_point("generate")
-    
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 
-# Export the compiled graph
+# Export the compiled graph. It has no checkpointer of its own because the
+# LangGraph server (langgraph.json) provides persistence when it loads it.
 graph = create_mcp_generator_graph()
\ No newline at end of file
@@ -1,22 +1,65 @@
 """Freestyle.sh tools for MCP server development and deployment."""
 
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
 import freestyle
 
+from .http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Threads for uploading files to dev servers; this caps how many writes are in
+# flight at once (the default executor may have fewer workers than this)
+WRITE_FILE_CONCURRENCY = 10
+_WRITE_FILE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=WRITE_FILE_CONCURRENCY,
+    thread_name_prefix="freestyle-write"
+)
+
+# Attribute names used for each field by different Freestyle SDK versions,
+# in the order they are tried
+_ATTR_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "repo_id": ("repo_id", "id", "repoId"),
+    "ephemeral_url": ("ephemeral_url", "ephemeralUrl"),
+    "mcp_ephemeral_url": ("mcp_ephemeral_url", "mcpEphemeralUrl"),
+    "code_server_url": ("code_server_url", "codeServerUrl"),
+    "is_new": ("is_new", "isNew"),
+    "dev_command_running": ("dev_command_running", "devCommandRunning"),
+    "install_command_running": ("install_command_running", "installCommandRunning"),
+}
+
+
+def _pick(obj: Any, field: str, default: Any = None) -> Any:
+    """Return the first truthy value among ``field``'s aliases on ``obj``."""
+    for name in _ATTR_ALIASES[field]:
+        value = getattr(obj, name, None)
+        if value:
+            return value
+    return default
+
+
 async def freestyle_create_repo(
     name: str,
-    project_files: Dict[str, str],
     freestyle_api_key: str,
     public: bool = True
 ) -> Dict[str, str]:
-    """Create a new Git repository on Freestyle.sh with the MCP server code.
+    """Create a new, empty Git repository on Freestyle.sh.
+    
+    The MCP server code is written afterwards through the dev server
+    (see freestyle_request_dev_server), so no files are sent here.
     
     Args:
         name: Name for the repository
-        project_files: Dictionary of filename -> content for the MCP server
         freestyle_api_key: Freestyle API key
         public: Whether to make the repo public (for testing)
         
@@ -25,26 +68,26 @@ async def freestyle_create_repo(
     """
     client = freestyle.Freestyle(freestyle_api_key)
     
-    # Create empty repository
-    repo = client.create_repository(
+    # Create empty repository. The SDK call is blocking, and this runs in
+    # parallel with generation, so keep it off the event loop.
+    repo = await asyncio.to_thread(
+        client.create_repository,
         name=name,
         public=public
     )
     
     # Extract repo_id from response - handle different possible attribute names
-    repo_id = getattr(repo, 'repo_id', None) or getattr(repo, 'id', None) or getattr(repo, 'repoId', None)
+    repo_id = _pick(repo, "repo_id")
     
     if not repo_id:
         # Debug: print available attributes if we can't find repo_id
         available_attrs = [attr for attr in dir(repo) if not attr.startswith('_')]
         raise Exception(f"Could not find repo_id in response. Available attributes: {available_attrs}")
     
-    # Store the project files to write later via the dev server
     return {
         "repo_id": repo_id,
         "name": name,
-        "status": "created",
-        "project_files": project_files  # Pass files to be written by dev server
+        "status": "created"
     }
 
 
@@ -65,45 +108,53 @@ async def freestyle_request_dev_server(
     """
     client = freestyle.Freestyle(freestyle_api_key)
     
+    # The SDK is synchronous, so every call below runs on a worker thread to
+    # keep the event loop free for other work (logging, probes, other runs)
+    
     # Request dev server
-    dev_server = client.request_dev_server(repo_id=repo_id)
+    dev_server = await asyncio.to_thread(client.request_dev_server, repo_id=repo_id)
     
     # Write project files if provided
     if project_files:
-        for file_path, content in project_files.items():
-            dev_server.fs.write_file(file_path, content)
+        # Each write is its own blocking HTTP request in the SDK, so run them
+        # on the upload pool instead of one after another
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(_WRITE_FILE_EXECUTOR, dev_server.fs.write_file, file_path, content)
+            for file_path, content in project_files.items()
+        ))
         
-        # Commit and push the initial files
-        dev_server.commit_and_push("Initial MCP server files")
+        # Commit and push the initial files once every write has landed
+        await asyncio.to_thread(dev_server.commit_and_push, "Initial MCP server files")
         
         # Start the MCP server with npm run dev
-        print("DEBUG: Starting MCP server with npm run dev...")
-        dev_server.process.exec("npm run dev")
+        logger.debug("Starting MCP server with npm run dev...")
+        await asyncio.to_thread(dev_server.process.exec, "npm run dev")
     
     # Extract URLs with fallbacks for different attribute names
-    ephemeral_url = getattr(dev_server, 'ephemeral_url', None) or getattr(dev_server, 'ephemeralUrl', None)
-    mcp_ephemeral_url = getattr(dev_server, 'mcp_ephemeral_url', None) or getattr(dev_server, 'mcpEphemeralUrl', None)
-    code_server_url = getattr(dev_server, 'code_server_url', None) or getattr(dev_server, 'codeServerUrl', None)
-    is_new = getattr(dev_server, 'is_new', None) or getattr(dev_server, 'isNew', False)
-    
     return {
-        "ephemeral_url": ephemeral_url,
-        "mcp_ephemeral_url": mcp_ephemeral_url,
-        "code_server_url": code_server_url,
+        "ephemeral_url": _pick(dev_server, "ephemeral_url"),
+        "mcp_ephemeral_url": _pick(dev_server, "mcp_ephemeral_url"),
+        "code_server_url": _pick(dev_server, "code_server_url"),
         "repo_id": repo_id,
-        "is_new": is_new,
-        "dev_command_running": getattr(dev_server, 'dev_command_running', False),
-        "install_command_running": getattr(dev_server, 'install_command_running', False)
+        "is_new": _pick(dev_server, "is_new", False),
+        "dev_command_running": _pick(dev_server, "dev_command_running", False),
+        "install_command_running": _pick(dev_server, "install_command_running", False)
     }
 
 
 
 
 
+# Delays between MCP server probes while `npm run dev` may still be starting
+PROBE_BACKOFF_DELAYS = (0.2, 0.4, 0.8, 1.6, 3.2)
+
+
 @tool
 async def freestyle_test_mcp_server(
     mcp_url: str,
-    freestyle_api_key: str
+    freestyle_api_key: str,
+    config: RunnableConfig
 ) -> Dict[str, Any]:
     """Test if the dev server is accessible and responding.
     
@@ -114,32 +165,63 @@ async def freestyle_test_mcp_server(
     Returns:
         Test results
     """
-    import httpx
-    
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Just check if the server is accessible with a simple GET request
-            response = await client.get(mcp_url)
-            
-            # If we get any response (even 404), the server is running
-            if response.status_code < 500:
-                return {
-                    "passed": True,
-                    "status_code": response.status_code,
-                    "message": "Server is accessible and responding"
+    # A server that was just started often refuses connections or returns
+    # 5xx for a moment, so retry those instead of failing the agent's turn.
+    # Anything else (e.g. a malformed URL) won't fix itself and is raised at once.
+    result: Dict[str, Any] = {}
+    async with get_http_client(config) as client:
+        for delay in (*PROBE_BACKOFF_DELAYS, None):
+            try:
+                # Just check if the server is accessible with a simple GET request
+                response = await client.get(mcp_url, timeout=10.0)
+            except httpx.UnsupportedProtocol:
+                raise
+            except httpx.TransportError as e:
+                result = {
+                    "passed": False,
+                    "error": f"Server not accessible: {str(e)}"
                 }
             else:
-                return {
+                # If we get any response (even 404), the server is running
+                if response.status_code < 500:
+                    return {
+                        "passed": True,
+                        "status_code": response.status_code,
+                        "message": "Server is accessible and responding"
+                    }
+                result = {
                     "passed": False,
                     "status_code": response.status_code,
                     "error": f"Server error: {response.status_code}"
                 }
-                
-    except Exception as e:
-        return {
-            "passed": False,
-            "error": f"Server not accessible: {str(e)}"
-        }
+            
+            if delay is not None:
+                await asyncio.sleep(delay)
+    
+    return result
+
+
+# Production deployments by repo ID. Repeated or concurrent deploy calls for the
+# same repo (e.g. the agent retrying) share one deployment instead of redeploying.
+# Only recent repos are kept, so a long-running server doesn't hold every result.
+PRODUCTION_DEPLOYMENTS_SIZE = 128
+_PRODUCTION_DEPLOYMENTS: "OrderedDict[str, asyncio.Future[Dict[str, str]]]" = OrderedDict()
+
+
+async def _deploy_production(repo_id: str, freestyle_api_key: str) -> Dict[str, str]:
+    """Deploy ``repo_id`` to production (currently a mock)."""
+    # Mock implementation - in reality you'd use Freestyle deployment API
+    # freestyle = FreestyleSandboxes(api_key=freestyle_api_key)
+    # deployment = await freestyle.deployToProduction({"repoId": repo_id})
+    
+    # Derive the ID from a stable digest; hash() is salted per process
+    deployment_suffix = int(hashlib.sha256(repo_id.encode()).hexdigest(), 16) % 1000
+    return {
+        "deployment_id": f"prod-{repo_id}-{deployment_suffix}",
+        "production_url": f"https://prod-{repo_id}.freestyle.sh",
+        "status": "deployed",
+        "repo_id": repo_id
+    }
 
 
 @tool
@@ -156,13 +238,22 @@ async def freestyle_deploy_production(
     Returns:
         Production deployment details
     """
-    # Mock implementation - in reality you'd use Freestyle deployment API
-    # freestyle = FreestyleSandboxes(api_key=freestyle_api_key)
-    # deployment = await freestyle.deployToProduction({"repoId": repo_id})
+    deployment = _PRODUCTION_DEPLOYMENTS.get(repo_id)
+    if deployment is not None:
+        _PRODUCTION_DEPLOYMENTS.move_to_end(repo_id)
+    else:
+        deployment = asyncio.ensure_future(_deploy_production(repo_id, freestyle_api_key))
+        _PRODUCTION_DEPLOYMENTS[repo_id] = deployment
+        while len(_PRODUCTION_DEPLOYMENTS) > PRODUCTION_DEPLOYMENTS_SIZE:
+            _PRODUCTION_DEPLOYMENTS.popitem(last=False)
+        
+        def forget_if_failed(future: "asyncio.Future[Dict[str, str]]") -> None:
+            # Failed deployments can be retried
+            if future.cancelled() or future.exception() is not None:
+                if _PRODUCTION_DEPLOYMENTS.get(repo_id) is future:
+                    del _PRODUCTION_DEPLOYMENTS[repo_id]
+        
+        deployment.add_done_callback(forget_if_failed)
     
-    return {
-        "deployment_id": f"prod-{repo_id}-{hash(repo_id) % 1000}",
-        "production_url": f"https://prod-{repo_id}.freestyle.sh",
-        "status": "deployed",
-        "repo_id": repo_id
-    }
\ No newline at end of file
+    # Shield so one caller being cancelled doesn't cancel the shared deployment
+    return await asyncio.shield(deployment)
@@ -0,0 +1,66 @@
+"""Shared HTTP client helpers for the MCP Generator tools."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Set
+
+import httpx
+from langchain_core.runnables import RunnableConfig
+
+# Process-wide client used when the caller doesn't inject one. httpx
+# connections belong to the event loop that opened them, so the client is
+# recreated if it is first used from a different loop (e.g. a second asyncio.run).
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Closes of replaced clients, referenced here so they aren't garbage collected mid-run
+_CLOSE_TASKS: Set["asyncio.Task[None]"] = set()
+
+
+async def _close_quietly(client: httpx.AsyncClient) -> None:
+    """Close a client replaced after an event loop change."""
+    try:
+        await client.aclose()
+    except Exception:
+        # Its connections belonged to the old loop, which may already be gone
+        pass
+
+
+def _get_shared_client() -> httpx.AsyncClient:
+    """Return the pooled module-level client for the running event loop."""
+    global _shared_client, _shared_client_loop
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client.is_closed or _shared_client_loop is not loop:
+        if _shared_client is not None and not _shared_client.is_closed:
+            task = loop.create_task(_close_quietly(_shared_client))
+            _CLOSE_TASKS.add(task)
+            task.add_done_callback(_CLOSE_TASKS.discard)
+        _shared_client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        _shared_client_loop = loop
+    return _shared_client
+
+
+async def aclose_shared_client() -> None:
+    """Close the module-level client, e.g. when an application shuts down."""
+    global _shared_client, _shared_client_loop
+    if _shared_client is not None:
+        await _shared_client.aclose()
+    _shared_client = None
+    _shared_client_loop = None
+
+
+@asynccontextmanager
+async def get_http_client(config: Optional[RunnableConfig] = None) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the ``http_client`` injected via ``configurable``, or the shared one.
+
+    Callers that run the graph many times can pass a long-lived
+    ``httpx.AsyncClient`` so connections are reused across requests.
+    Otherwise a pooled module-level client is used, so repeated calls
+    still avoid a new TCP/TLS handshake each time. Neither client is
+    closed here; their owners are responsible for that.
+    """
+    client = ((config or {}).get("configurable") or {}).get("http_client")
+    yield client if client is not None else _get_shared_client()
@@ -1,14 +1,37 @@
 """Morph LLM tool for applying code edits."""
 
-import httpx
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+import orjson
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
+from .http_client import get_http_client
+
+# Recent edits keyed by a digest of (file content, instructions). Storing the
+# future rather than the result means identical concurrent calls share one
+# Morph request; failed requests are dropped so they can be retried.
+MORPH_CACHE_SIZE = 128
+_MORPH_EDITS: "OrderedDict[str, asyncio.Future[str]]" = OrderedDict()
+
+
+def _edit_key(file_content: str, edit_instructions: str) -> str:
+    """Hash an edit request into a cache key."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(file_content.encode())
+    digest.update(b"\0")
+    digest.update(edit_instructions.encode())
+    return digest.hexdigest()
+
 
 @tool
 async def morph_apply_edit(
     file_content: str,
     edit_instructions: str,
-    morph_api_key: str
+    morph_api_key: str,
+    config: RunnableConfig
 ) -> str:
     """Apply code edits using Morph LLM.
     
@@ -23,6 +46,36 @@ async def morph_apply_edit(
     if not morph_api_key:
         raise ValueError("Morph API key is required")
     
+    key = _edit_key(file_content, edit_instructions)
+    edit = _MORPH_EDITS.get(key)
+    if edit is not None:
+        _MORPH_EDITS.move_to_end(key)
+    else:
+        edit = asyncio.ensure_future(
+            _request_edit(file_content, edit_instructions, morph_api_key, config)
+        )
+        _MORPH_EDITS[key] = edit
+        while len(_MORPH_EDITS) > MORPH_CACHE_SIZE:
+            _MORPH_EDITS.popitem(last=False)
+        
+        def forget_if_failed(future: "asyncio.Future[str]") -> None:
+            if future.cancelled() or future.exception() is not None:
+                if _MORPH_EDITS.get(key) is future:
+                    del _MORPH_EDITS[key]
+        
+        edit.add_done_callback(forget_if_failed)
+    
+    # Shield so one caller being cancelled doesn't cancel the shared request
+    return await asyncio.shield(edit)
+
+
+async def _request_edit(
+    file_content: str,
+    edit_instructions: str,
+    morph_api_key: str,
+    config: RunnableConfig
+) -> str:
+    """Send one edit request to Morph and return the edited code."""
     # Format the message using Morph's required XML format
     message_content = f"""<instruction>{edit_instructions}</instruction>
 <code>{file_content}</code>
@@ -44,17 +97,18 @@ async def morph_apply_edit(
         "Content-Type": "application/json"
     }
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with get_http_client(config) as client:
         response = await client.post(
             "https://api.morphllm.com/v1/chat/completions",
-            json=payload,
-            headers=headers
+            content=orjson.dumps(payload),
+            headers=headers,
+            timeout=30.0
         )
         
         if response.status_code != 200:
             raise Exception(f"Morph API failed: {response.status_code} - {response.text}")
         
-        result = response.json()
+        result = orjson.loads(response.content)
         
         # Extract the edited code from the response
         if "choices" in result and len(result["choices"]) > 0:
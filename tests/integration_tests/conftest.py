@@ -0,0 +1,5 @@
+import os
+
+# When tracing is on (e.g. the nightly run), export traces from a background
+# thread instead of blocking each LLM/graph call on the upload
+os.environ.setdefault("LANGCHAIN_CALLBACKS_BACKGROUND", "true")
@@ -1,107 +1,295 @@
 """Integration tests for MCP Generator agent."""
 
+import asyncio
+import sys
+from collections import OrderedDict
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import AsyncMock
+
 import pytest
-import os
-import tempfile
+from langchain_core.caches import InMemoryCache
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from agent import DEFAULT_INPUT_STATE, graph
 
-from agent import graph
+# `agent.graph` resolves to the compiled graph; nodes live on the module
+graph_module = sys.modules["agent.graph"]
 
 pytestmark = pytest.mark.anyio
 
+# Read-only inputs shared by the tests, built once at import
+DESCRIPTION_INPUT = MappingProxyType({
+    **DEFAULT_INPUT_STATE,
+    "input_type": "description",
+    "input_data": "Create a simple MCP server with a hello world tool that takes a name parameter and returns a greeting",
+    "max_iterations": 2,
+})
+EMPTY_CONFIG = MappingProxyType({"configurable": MappingProxyType({})})
 
-@pytest.mark.langsmith
-async def test_mcp_generator_with_description() -> None:
+
+@pytest.fixture(scope="module")
+def compiled_graph():
+    """The graph compiled when agent.graph was imported, shared by this module."""
+    return graph
+
+
+async def test_mcp_generator_with_description(compiled_graph, fake_llm, monkeypatch) -> None:
     """Test generating MCP server from description."""
-    # Create a simple description
-    input_state = {
-        "user_description": "Create a simple MCP server with a hello world tool that takes a name parameter and returns a greeting",
-        "max_iterations": 2,
-        "current_iteration": 0,
-        "deployment_stage": "none",
-        "errors": [],
-        "test_results": [],
-        "validation_errors": [],
-        "refinement_history": [],
-        "mcp_server_code": {},
-    }
+    # Keep Freestyle offline: record what would be deployed instead
+    create_repo = AsyncMock(return_value={"repo_id": "repo-123", "name": "mcp", "status": "created"})
+    request_dev_server = AsyncMock(return_value={"mcp_ephemeral_url": None, "repo_id": "repo-123"})
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "freestyle_create_repo", create_repo)
+    monkeypatch.setattr(graph_module, "freestyle_request_dev_server", request_dev_server)
+    # Without a Morph key the ReAct step fails fast instead of calling out
+    monkeypatch.setattr(graph_module, "MORPH_API_KEY", None)
     
-    config = {
-        "configurable": {
-            "anthropic_api_key": os.getenv("ANTHROPIC_API_KEY"),
-            "use_local_freestyle": True,
-            "max_iterations": 2,
-        }
-    }
+    # Run the agent (LangGraph only accepts a plain dict as input)
+    result = await compiled_graph.ainvoke(dict(DESCRIPTION_INPUT), EMPTY_CONFIG)
     
-    # Skip if no API key
-    if not config["configurable"]["anthropic_api_key"]:
-        pytest.skip("ANTHROPIC_API_KEY not set")
+    # The generated files were uploaded to the repository created in parallel
+    create_repo.assert_awaited_once()
+    request_dev_server.assert_awaited_once()
+    assert request_dev_server.await_args.kwargs["repo_id"] == "repo-123"
+    assert request_dev_server.await_args.kwargs["project_files"] == fake_llm
     
-    # Run the agent
-    result = await graph.ainvoke(input_state, config)
+    assert result["repo_id"] == "repo-123"
+    assert result["mcp_server_files"] is None
+    assert [e["phase"] for e in result["errors"]] == ["react_workflow"]
     
-    # Verify basic results
-    assert result is not None
-    assert "current_phase" in result
-    assert "mcp_server_code" in result
-    assert len(result["mcp_server_code"]) > 0
+
+async def test_node_latencies(compiled_graph, fake_llm, node_timings, monkeypatch, request) -> None:
+    """Report each node's own overhead on an offline run.
+    
+    The timings are printed in the test summary, not asserted: wall-clock
+    budgets flake under xdist and on shared CI runners.
+    """
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "freestyle_create_repo", AsyncMock(return_value={"repo_id": "repo-123"}))
+    monkeypatch.setattr(graph_module, "freestyle_request_dev_server", AsyncMock(return_value={}))
+    monkeypatch.setattr(graph_module, "MORPH_API_KEY", None)
     
+    await compiled_graph.ainvoke(dict(DESCRIPTION_INPUT), {"callbacks": [node_timings]})
+    
+    assert node_timings.timings.keys() == {"generate", "prepare_deploy", "deploy_dev", "react_agent"}
+    request.node.user_properties.append(("node_timings_ms", node_timings.timings))
+
 
 @pytest.mark.langsmith
-async def test_input_classification() -> None:
-    """Test input classification node."""
-    from agent.graph import classify_input
+async def test_mcp_generator_with_description_live(compiled_graph) -> None:
+    """Test generating and deploying an MCP server with the real services."""
+    # Skip if no API keys
+    if not (graph_module.ANTHROPIC_API_KEY and graph_module.FREESTYLE_API_KEY):
+        pytest.skip("ANTHROPIC_API_KEY and FREESTYLE_API_KEY must be set")
     
-    # Test OpenAPI classification
-    state_openapi = {
-        "openapi_url": "https://example.com/openapi.json",
-    }
-    result = await classify_input(state_openapi, {"configurable": {}})
-    assert result["input_type"] == "openapi"
+    result = await compiled_graph.ainvoke(dict(DESCRIPTION_INPUT), EMPTY_CONFIG)
+    
+    # Generation and the dev deploy must succeed; the ReAct step depends on
+    # the generated code actually starting, so it isn't asserted here
+    failed_phases = {e["phase"] for e in result.get("errors", [])}
+    assert not failed_phases & {"generation", "deployment"}, result["errors"]
+    assert result["repo_id"]
+    assert result["dev_server_info"]["ephemeral_url"]
+
+
+async def test_input_classification(fake_llm, monkeypatch) -> None:
+    """Test that the generate node handles each input type."""
+    generate = graph_module.generate_mcp_server
+    
+    # Serve the OpenAPI case from the generator cache instead of running npx
+    openapi_files = {"src/index.ts": "// generated from spec\n"}
+    monkeypatch.setattr(graph_module, "_load_generator_cache", lambda spec_url: openapi_files)
+    
+    state_openapi = {"input_type": "openapi", "input_data": " https://example.com/openapi.json "}
+    state_desc = {"input_type": "description", "input_data": "Create an MCP server"}
+    state_bad_url = {"input_type": "openapi", "input_data": "example.com/openapi.json"}
+    
+    # The cases are independent, so run them concurrently
+    r_openapi, r_desc, r_bad_url = await asyncio.gather(
+        generate(state_openapi, EMPTY_CONFIG),
+        generate(state_desc, EMPTY_CONFIG),
+        generate(state_bad_url, EMPTY_CONFIG),
+    )
+    
+    # Test OpenAPI input
+    assert r_openapi["mcp_server_files"] == openapi_files
+    assert r_openapi["current_phase"] == "deploying"
+    
+    # Test description input
+    assert r_desc["mcp_server_files"] == fake_llm
+    assert r_desc["current_phase"] == "deploying"
+    
+    # Test an OpenAPI input that isn't a URL
+    assert r_bad_url["errors"][0]["phase"] == "generation"
+    assert r_bad_url["current_phase"] == "failed"
+
+
+@pytest.mark.parametrize("llm_cache", [None, InMemoryCache()], ids=["streamed", "cached"])
+async def test_description_generation_with_and_without_cache(fake_llm, monkeypatch, llm_cache) -> None:
+    """Test that generation streams without an LLM cache and invokes with one."""
+    monkeypatch.setattr(graph_module, "llm", SimpleNamespace(cache=llm_cache))
+    ainvoke = AsyncMock(wraps=graph_module.structured_llm.ainvoke)
+    monkeypatch.setattr(graph_module.structured_llm, "ainvoke", ainvoke)
+    
+    result = await graph_module.generate_mcp_server(
+        {"input_type": "description", "input_data": "Create an MCP server"}, EMPTY_CONFIG
+    )
+    
+    assert result["mcp_server_files"] == fake_llm
+    assert ainvoke.await_count == (llm_cache is not None)
+
+
+async def test_prepare_deploy_creates_repo(monkeypatch) -> None:
+    """Test that prepare_deploy creates the repository."""
+    create_repo = AsyncMock(return_value={"repo_id": "repo-123", "name": "mcp", "status": "created"})
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "freestyle_create_repo", create_repo)
+    
+    result = await graph_module.prepare_deployment({}, EMPTY_CONFIG)
+    
+    assert result["repo_id"] == "repo-123"
+    assert result["repo_name"] == create_repo.await_args.kwargs["name"]
+    assert "current_phase" not in result
+
+
+async def test_prepare_deploy_records_errors(monkeypatch) -> None:
+    """Test that prepare_deploy reports failures without raising."""
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", None)
+    result = await graph_module.prepare_deployment({}, EMPTY_CONFIG)
+    assert "FREESTYLE_API_KEY" in result["deploy_prep_error"]
     
-    # Test description classification
-    state_desc = {
-        "user_description": "Create an MCP server",
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "freestyle_create_repo", AsyncMock(side_effect=Exception("quota exceeded")))
+    result = await graph_module.prepare_deployment({}, EMPTY_CONFIG)
+    assert result == {"deploy_prep_error": "quota exceeded"}
+
+
+async def test_deploy_dev_uploads_files(monkeypatch) -> None:
+    """Test that deploy_dev uploads the generated files and clears them from state."""
+    dev_server_info = {"mcp_ephemeral_url": "https://dev.example.com/mcp", "repo_id": "repo-123"}
+    request_dev_server = AsyncMock(return_value=dev_server_info)
+    monkeypatch.setattr(graph_module, "freestyle_request_dev_server", request_dev_server)
+    
+    files = {"index.js": "// server\n"}
+    result = await graph_module.deploy_to_dev_server(
+        {"repo_id": "repo-123", "mcp_server_files": files}, EMPTY_CONFIG
+    )
+    
+    assert request_dev_server.await_args.kwargs["project_files"] == files
+    assert result["dev_server_info"] == dev_server_info
+    assert result["mcp_server_files"] is None
+    assert result["current_phase"] == "refining"
+
+
+async def test_deploy_dev_raises_prep_error(monkeypatch) -> None:
+    """Test that deploy_dev fails with the error recorded by prepare_deploy."""
+    request_dev_server = AsyncMock()
+    monkeypatch.setattr(graph_module, "freestyle_request_dev_server", request_dev_server)
+    
+    result = await graph_module.deploy_to_dev_server(
+        {"deploy_prep_error": "quota exceeded", "mcp_server_files": {}}, EMPTY_CONFIG
+    )
+    
+    request_dev_server.assert_not_awaited()
+    assert result["errors"] == [{"phase": "deployment", "error": "quota exceeded"}]
+    assert result["current_phase"] == "failed"
+
+
+async def test_resume_retries_failed_repo_creation(fake_llm, monkeypatch) -> None:
+    """Test that resuming a run whose repo creation failed creates the repo again."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    
+    from agent.checkpoint import ainvoke_resumable
+    
+    create_repo = AsyncMock(side_effect=[
+        Exception("transient 503"),
+        {"repo_id": "repo-123", "name": "mcp", "status": "created"},
+    ])
+    request_dev_server = AsyncMock(return_value={"repo_id": "repo-123"})
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "freestyle_create_repo", create_repo)
+    monkeypatch.setattr(graph_module, "freestyle_request_dev_server", request_dev_server)
+    monkeypatch.setattr(graph_module, "MORPH_API_KEY", None)
+    
+    checkpointed_graph = graph_module.create_mcp_generator_graph(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "resume-test"}}
+    
+    result = await ainvoke_resumable(checkpointed_graph, dict(DESCRIPTION_INPUT), config)
+    assert result["errors"][0] == {"phase": "deployment", "error": "transient 503"}
+    request_dev_server.assert_not_awaited()
+    
+    result = await ainvoke_resumable(checkpointed_graph, dict(DESCRIPTION_INPUT), config)
+    assert create_repo.await_count == 2
+    request_dev_server.assert_awaited_once()
+    assert result["repo_id"] == "repo-123"
+    assert result["deploy_prep_error"] is None
+
+
+async def test_react_agent_requires_mcp_url(monkeypatch) -> None:
+    """Test that the ReAct step fails without a dev server MCP URL."""
+    monkeypatch.setattr(graph_module, "FREESTYLE_API_KEY", "test-key")
+    monkeypatch.setattr(graph_module, "MORPH_API_KEY", "test-key")
+    
+    result = await graph_module.react_agent_workflow({"dev_server_info": {}}, EMPTY_CONFIG)
+    
+    assert result["errors"][0]["phase"] == "react_workflow"
+    assert "No MCP server URL" in result["errors"][0]["error"]
+    assert result["current_phase"] == "failed"
+
+
+class ToolCallingFakeModel(GenericFakeChatModel):
+    """Fake chat model that create_react_agent can bind tools to."""
+    
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@tool
+def probe_server(url: str) -> str:
+    """Probe the MCP server (stands in for the dev server's MCP tools)."""
+    return "ok"
+
+
+def _run_react_agent(monkeypatch, tool_rounds: int, max_iterations: int):
+    """Run react_agent_workflow with a real ReAct agent on a fake model.
+    
+    The model calls probe_server ``tool_rounds`` times, then answers.
+    """
+    replies = [
+        AIMessage(content="", tool_calls=[{"name": "probe_server", "args": {"url": "mcp"}, "id": f"call-{i}"}])
+        for i in range(tool_rounds)
+    ] + [AIMessage(content="Deployed")]
+    for key in ("ANTHROPIC_API_KEY", "FREESTYLE_API_KEY", "MORPH_API_KEY"):
+        monkeypatch.setattr(graph_module, key, "test-key")
+    monkeypatch.setattr(graph_module, "llm_fast", ToolCallingFakeModel(messages=iter(replies)))
+    monkeypatch.setattr(graph_module, "_get_mcp_tools", AsyncMock(return_value=[probe_server]))
+    monkeypatch.setattr(graph_module, "_REACT_AGENT_CACHE", OrderedDict())
+    
+    state = {
+        "input_type": graph_module.InputType.DESCRIPTION,
+        "input_data": "Create an MCP server",
+        "repo_id": "repo-123",
+        "max_iterations": max_iterations,
+        "dev_server_info": {"mcp_ephemeral_url": "https://dev.example.com/mcp"},
     }
-    result = await classify_input(state_desc, {"configurable": {}})
-    assert result["input_type"] == "description"
+    return graph_module.react_agent_workflow(state, EMPTY_CONFIG)
+
+
+async def test_react_agent_gets_max_iterations_tool_rounds(monkeypatch) -> None:
+    """Test that the agent can use all max_iterations tool rounds and still answer."""
+    result = await _run_react_agent(monkeypatch, tool_rounds=2, max_iterations=2)
     
-    # Test no input
-    state_empty = {}
-    result = await classify_input(state_empty, {"configurable": {}})
-    assert "errors" in result
-    assert result.get("current_phase") == "failed"
+    assert "errors" not in result
+    assert result["current_phase"] == "completed"
 
 
-@pytest.mark.langsmith
-async def test_error_analysis() -> None:
-    """Test error analysis functionality."""
-    from agent.refiner import analyze_errors
-    from agent.graph import TestResult
-    
-    # Create test results with errors
-    test_results = [
-        TestResult(
-            test_name="server_health",
-            passed=False,
-            error="Connection timeout",
-        ),
-        TestResult(
-            test_name="list_tools",
-            passed=False,
-            error="404 Not Found",
-        ),
-    ]
-    
-    validation_errors = [
-        "Tool schema validation failed",
-        "Server returned 500 error",
-    ]
-    
-    # Analyze errors
-    analysis = analyze_errors(test_results, validation_errors)
-    
-    assert "failed_tests" in analysis
-    assert len(analysis["failed_tests"]) == 2
-    assert "error_patterns" in analysis
-    assert "suggested_fixes" in analysis
\ No newline at end of file
+async def test_react_agent_fails_when_out_of_steps(monkeypatch) -> None:
+    """Test that an agent run cut off by its step budget is not marked completed."""
+    result = await _run_react_agent(monkeypatch, tool_rounds=3, max_iterations=2)
+    
+    assert result["errors"][0]["phase"] == "react_workflow"
+    assert "ran out of steps" in result["errors"][0]["error"]
+    assert result["current_phase"] == "failed"
+    assert "completed_at" not in result
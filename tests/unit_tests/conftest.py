@@ -0,0 +1,6 @@
+import os
+
+# Unit tests never need traces. Turn tracing off before agent.* is imported;
+# load_dotenv() won't override variables that are already set.
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["LANGCHAIN_TRACING_V2"] = "false"